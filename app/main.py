@@ -19,6 +19,7 @@ from app.modules.intelligence.agents.agents_router import router as agent_router
 from app.modules.intelligence.prompts.prompt_router import router as prompt_router
 from app.modules.intelligence.prompts.system_prompt_setup import SystemPromptSetup
 from app.modules.intelligence.provider.provider_router import router as provider_router
+from app.modules.intelligence.provider.provider_service import ProviderService
 from app.modules.intelligence.tools.tool_router import router as tool_router
 from app.modules.key_management.secret_manager import router as secret_manager_router
 from app.modules.parsing.graph_construction.parsing_router import (
@@ -155,6 +156,7 @@ class MainApp:
             }
 
     async def startup_event(self):
+        ProviderService.open_shared_client()
         db = SessionLocal()
         try:
             system_prompt_setup = SystemPromptSetup(db)
@@ -165,10 +167,15 @@ class MainApp:
             raise
         finally:
             db.close()
+        await ProviderService.prewarm()
+
+    async def shutdown_event(self):
+        await ProviderService.close_shared_client()
 
     def run(self):
         self.add_health_check()
         self.app.add_event_handler("startup", self.startup_event)
+        self.app.add_event_handler("shutdown", self.shutdown_event)
         return self.app
 
 
@@ -184,7 +184,7 @@ class SimplifiedAgentSupervisor:
             user_id=state["user_id"],
             node_ids=state["node_ids"],
         ):
-            if isinstance(chunk, str):
+            if isinstance(chunk, (str, bytes)):
                 writer(chunk)
 
     def build_graph(self) -> StateGraph:
@@ -108,7 +108,7 @@ class AgentFactory:
                 mini_llm, reasoning_llm, self.db
             ),
             "code_changes_agent": lambda: CodeChangesChatAgent(
-                mini_llm, reasoning_llm, self.db
+                mini_llm, reasoning_llm, self.db, self.provider_service
             ),
             "LLD_agent": lambda: LLDChatAgent(mini_llm, reasoning_llm, self.db),
             "code_generation_agent": lambda: CodeGenerationChatAgent(
@@ -124,7 +124,10 @@ class AgentFactory:
             # If not a system agent, create custom agent
             logger.info(f"Creating custom agent for agent_id: {agent_id}")
             return CustomAgent(
-                llm=reasoning_llm, db=self.db, agent_id=agent_id, user_id=user_id
+                llm_provider=self.provider_service,
+                db=self.db,
+                agent_id=agent_id,
+                user_id=user_id,
             )
             
         except Exception as e:
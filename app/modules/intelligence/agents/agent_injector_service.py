@@ -53,7 +53,7 @@ class AgentInjectorService:
                 mini_llm, reasoning_llm, self.sql_db
             ),
             "code_changes_agent": CodeChangesChatAgent(
-                mini_llm, reasoning_llm, self.sql_db
+                mini_llm, reasoning_llm, self.sql_db, self.provider_service
             ),
             "LLD_agent": LLDChatAgent(mini_llm, reasoning_llm, self.sql_db),
             "code_generation_agent": CodeGenerationChatAgent(
@@ -65,11 +65,8 @@ class AgentInjectorService:
         if agent_id in self.agents:
             return self.agents[agent_id]
         else:
-            reasoning_llm = self.provider_service.get_large_llm(
-                agent_type=AgentType.LANGCHAIN
-            )
             return CustomAgent(
-                llm=reasoning_llm,
+                llm_provider=self.provider_service,
                 db=self.sql_db,
                 agent_id=agent_id,
                 user_id=self.user_id,
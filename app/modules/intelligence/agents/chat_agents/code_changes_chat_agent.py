@@ -1,26 +1,21 @@
-import json
+import hashlib
 import logging
-from functools import lru_cache
-from typing import AsyncGenerator, Dict, List
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, SystemMessage
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-    HumanMessagePromptTemplate,
-    MessagesPlaceholder,
-    SystemMessagePromptTemplate,
-)
-from langchain_core.runnables import RunnableSequence
+from langchain_core.prompts import ChatPromptTemplate
 from sqlalchemy.orm import Session
 
-from app.modules.conversations.message.message_model import MessageType
 from app.modules.conversations.message.message_schema import NodeContext
 from app.modules.intelligence.agents.agents.blast_radius_agent import (
     kickoff_blast_radius_agent,
 )
 from app.modules.intelligence.agents.agents_service import AgentsService
-from app.modules.intelligence.memory.chat_history_service import ChatHistoryService
+from app.modules.intelligence.agents.streaming_agent_base import (
+    BaseStreamingChatAgent,
+)
 from app.modules.intelligence.prompts.classification_prompts import (
     AgentType,
     ClassificationPrompts,
@@ -28,177 +23,109 @@ from app.modules.intelligence.prompts.classification_prompts import (
     ClassificationResult,
 )
 from app.modules.intelligence.prompts.prompt_schema import PromptResponse, PromptType
-from app.modules.intelligence.prompts.prompt_service import PromptService
 from app.modules.intelligence.provider.provider_service import ProviderService
-import asyncio
 from app.modules.utils.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Classification results for recent (query, history tail) pairs, so retried
+# or resubmitted queries skip the classification LLM call.
+_CLASSIFICATION_CACHE: "OrderedDict[Tuple[str, str], ClassificationResult]" = (
+    OrderedDict()
+)
+_CLASSIFICATION_CACHE_SIZE = 1024
+
+# The classification prompt and parser are constant, so build them once.
+_CLASSIFICATION_PARSER = PydanticOutputParser(pydantic_object=ClassificationResponse)
+_CLASSIFICATION_PROMPT = ChatPromptTemplate.from_template(
+    template=ClassificationPrompts.get_classification_prompt(AgentType.CODE_CHANGES),
+    partial_variables={
+        "format_instructions": _CLASSIFICATION_PARSER.get_format_instructions()
+    },
+)
+
 
-class CodeChangesChatAgent:
-    def __init__(self, mini_llm, llm, db: Session):
+class CodeChangesChatAgent(BaseStreamingChatAgent):
+    agent_id = "CODE_CHANGES_AGENT"
+
+    def __init__(self, mini_llm, llm, db: Session, llm_provider: ProviderService):
+        super().__init__(db, llm_provider)
         self.mini_llm = mini_llm
-        self._llm = None
-        self._llm_provider = ProviderService(db)
-        self.history_manager = ChatHistoryService(db)
-        self.prompt_service = PromptService(db)
+        self.llm = llm
         self.agents_service = AgentsService(db)
-        self.chain = None
-        self.db = db
+        self._prompts: Optional[Dict[PromptType, PromptResponse]] = None
         self.llm_rate_limiter = RateLimiter(name="LLM_API")
         logger.debug("Rate limiter initialized for CodeChangesChatAgent")
 
-    async def _get_llm(self):
-        try:
-            await asyncio.wait_for(
-                self.llm_rate_limiter.acquire(),
-                timeout=30
-            )
-            logger.debug("Rate limiter acquired for LLM call")
-            
-            if self._llm is None:
-                self._llm = await self._llm_provider.get_small_llm(agent_type=AgentType.LANGCHAIN)
-            return self._llm
-
-        except asyncio.TimeoutError:
-            logger.error("Timeout waiting for rate limiter")
-            raise Exception("Service is currently overloaded. Please try again later.")
-        except Exception as e:
-            if "429" in str(e) or "quota exceeded" in str(e).lower():
-                self.llm_rate_limiter.handle_quota_exceeded()
-                logger.error("LLM API quota exceeded")
-            logger.error(f"Error getting LLM: {str(e)}", exc_info=True)
-            raise
-
-    @lru_cache(maxsize=2)
     async def _get_prompts(self) -> Dict[PromptType, PromptResponse]:
-        prompts = await self.prompt_service.get_prompts_by_agent_id_and_types(
-            "CODE_CHANGES_AGENT", [PromptType.SYSTEM, PromptType.HUMAN]
-        )
-        return {prompt.type: prompt for prompt in prompts}
+        # lru_cache on a coroutine function caches the coroutine object, which
+        # can only be awaited once; memoize the resolved dict on the instance.
+        if self._prompts is None:
+            prompts = await self.prompt_service.get_prompts_by_agent_id_and_types(
+                "CODE_CHANGES_AGENT", [PromptType.SYSTEM, PromptType.HUMAN]
+            )
+            self._prompts = {prompt.type: prompt for prompt in prompts}
+        return self._prompts
 
-    async def _create_chain(self) -> RunnableSequence:
+    async def _get_prompt_texts(self) -> Tuple[str, Optional[str]]:
         prompts = await self._get_prompts()
         system_prompt = prompts.get(PromptType.SYSTEM)
         human_prompt = prompts.get(PromptType.HUMAN)
 
         if not system_prompt or not human_prompt:
             raise ValueError("Required prompts not found for CODE_CHANGES_AGENT")
-
-        prompt_template = ChatPromptTemplate(
-            messages=[
-                SystemMessagePromptTemplate.from_template(system_prompt.text),
-                MessagesPlaceholder(variable_name="history"),
-                MessagesPlaceholder(variable_name="tool_results"),
-                HumanMessagePromptTemplate.from_template(human_prompt.text),
-            ]
-        )
-        llm = await self._get_llm()
-        return prompt_template | llm
-
-    async def _classify_query(self, query: str, history: List[HumanMessage]):
-        prompt = ClassificationPrompts.get_classification_prompt(AgentType.CODE_CHANGES)
-        inputs = {"query": query, "history": [msg.content for msg in history[-5:]]}
-
-        parser = PydanticOutputParser(pydantic_object=ClassificationResponse)
-        prompt_with_parser = ChatPromptTemplate.from_template(
-            template=prompt,
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-        chain = prompt_with_parser | self.llm | parser
+        return system_prompt.text, human_prompt.text
+
+    async def _classify_query(self, query: str, history_snippets: List[str]):
+        history_key = hashlib.blake2b(
+            "\x00".join(history_snippets).encode(), digest_size=16
+        ).hexdigest()
+        cache_key = (query, history_key)
+        cached = _CLASSIFICATION_CACHE.get(cache_key)
+        if cached is not None:
+            _CLASSIFICATION_CACHE.move_to_end(cache_key)
+            return cached
+
+        inputs = {"query": query, "history": history_snippets}
+        chain = _CLASSIFICATION_PROMPT | self.llm | _CLASSIFICATION_PARSER
         response = await chain.ainvoke(input=inputs)
 
+        _CLASSIFICATION_CACHE[cache_key] = response.classification
+        if len(_CLASSIFICATION_CACHE) > _CLASSIFICATION_CACHE_SIZE:
+            _CLASSIFICATION_CACHE.popitem(last=False)
         return response.classification
 
-    async def run(
+    async def _build_tool_results(
         self,
         query: str,
         project_id: str,
         user_id: str,
         conversation_id: str,
         node_ids: List[NodeContext],
-    ) -> AsyncGenerator[str, None]:
-        try:
-            if not self.chain:
-                self.chain = await self._create_chain()
-
-            history = self.history_manager.get_session_history(user_id, conversation_id)
-            validated_history = [
-                (
-                    HumanMessage(content=str(msg))
-                    if isinstance(msg, (str, int, float))
-                    else msg
-                )
-                for msg in history
-            ]
-
-            classification = await self._classify_query(query, validated_history)
-
-            tool_results = []
+        history: List[BaseMessage],
+    ) -> Tuple[List[BaseMessage], Optional[List[str]]]:
+        history_snippets = [msg.content for msg in history[-5:]]
+        classification = await self._classify_query(query, history_snippets)
+        if classification != ClassificationResult.AGENT_REQUIRED:
+            return [], None
+
+        # Not started speculatively: the crew runs in a worker thread that
+        # cannot be cancelled, and it shares this request's DB session.
+        blast_radius_result = await kickoff_blast_radius_agent(
+            query,
+            project_id,
+            node_ids,
+            self.db,
+            user_id,
+            self.mini_llm,
+        )
+
+        if blast_radius_result.pydantic:
+            citations = blast_radius_result.pydantic.citations
+            response = blast_radius_result.pydantic.response
+        else:
             citations = []
-            if classification == ClassificationResult.AGENT_REQUIRED:
-                blast_radius_result = await kickoff_blast_radius_agent(
-                    query,
-                    project_id,
-                    node_ids,
-                    self.db,
-                    user_id,
-                    self.mini_llm,
-                )
-
-                if blast_radius_result.pydantic:
-                    citations = blast_radius_result.pydantic.citations
-                    response = blast_radius_result.pydantic.response
-                else:
-                    citations = []
-                    response = blast_radius_result.raw
-
-                tool_results = [
-                    SystemMessage(content=f"Blast Radius Agent result: {response}")
-                ]
-
-            inputs = {
-                "history": validated_history,
-                "tool_results": tool_results,
-                "input": query,
-            }
-
-            logger.debug(f"Inputs to LLM: {inputs}")
-
-            full_response = ""
-            citations = self.agents_service.format_citations(citations)
-            async for chunk in self.chain.astream(inputs):
-                content = chunk.content if hasattr(chunk, "content") else str(chunk)
-                full_response += content
-                self.history_manager.add_message_chunk(
-                    conversation_id,
-                    content,
-                    MessageType.AI_GENERATED,
-                    citations=(
-                        citations
-                        if classification == ClassificationResult.AGENT_REQUIRED
-                        else None
-                    ),
-                )
-                yield json.dumps(
-                    {
-                        "citations": (
-                            citations
-                            if classification == ClassificationResult.AGENT_REQUIRED
-                            else []
-                        ),
-                        "message": content,
-                    }
-                )
-
-            logger.debug(f"Full LLM response: {full_response}")
-            self.history_manager.flush_message_buffer(
-                conversation_id, MessageType.AI_GENERATED
-            )
+            response = blast_radius_result.raw
 
-        except Exception as e:
-            logger.error(
-                f"Error during CodeChangesChatAgent run: {str(e)}", exc_info=True
-            )
-            yield f"An error occurred: {str(e)}"
+        tool_results = [SystemMessage(content=f"Blast Radius Agent result: {response}")]
+        return tool_results, self.agents_service.format_citations(citations)
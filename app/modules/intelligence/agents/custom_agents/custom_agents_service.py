@@ -6,6 +6,7 @@ import httpx
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
+from app.modules.auth.auth_service import AuthService
 from app.modules.conversations.message.message_schema import NodeContext
 from app.modules.intelligence.agents.agents_service import AgentsService
 
@@ -56,6 +57,34 @@ class CustomAgentsService:
                 )
                 raise
 
+    async def get_system_prompt(self, agent_id: str, user_id: str) -> str:
+        agent_url = f"{self.base_url}/custom-agents/agents/{agent_id}"
+        hmac_signature = AuthService.generate_hmac_signature(user_id)
+        headers = {"X-HMAC-Signature": hmac_signature}
+
+        async with httpx.AsyncClient(headers=headers) as client:
+            try:
+                response = await client.get(agent_url, params={"user_id": user_id})
+                response.raise_for_status()
+                agent = response.json()
+            except httpx.HTTPStatusError as e:
+                logger.error(
+                    f"HTTP error occurred while fetching agent {agent_id}: {e}"
+                )
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Unexpected error occurred while fetching agent {agent_id}: {e}"
+                )
+                raise
+
+        sections = [
+            f"You are {agent['role']}." if agent.get("role") else "",
+            f"Your goal: {agent['goal']}" if agent.get("goal") else "",
+            agent.get("backstory") or "",
+        ]
+        return "\n\n".join(section for section in sections if section)
+
     async def validate_agent(self, db: Session, user_id: str, agent_id: str) -> bool:
         try:
             agents_service = AgentsService(db)
@@ -0,0 +1,243 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+import orjson
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    HumanMessagePromptTemplate,
+    MessagesPlaceholder,
+    SystemMessagePromptTemplate,
+)
+from langchain_core.runnables import RunnableSequence
+from sqlalchemy.orm import Session
+
+from app.modules.conversations.message.message_model import MessageType
+from app.modules.conversations.message.message_schema import NodeContext
+from app.modules.intelligence.memory.chat_history_service import ChatHistoryService
+from app.modules.intelligence.prompts.prompt_service import PromptService
+from app.modules.intelligence.provider.provider_service import (
+    AgentType,
+    ProviderService,
+)
+from app.modules.utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Prompt templates are shared across agent instances, keyed by agent_id; each
+# instance pipes the cached template into its own LLM. Entries expire so that
+# prompts edited through the prompts API reach every worker, and the cache is
+# bounded because custom agent ids are unbounded.
+_PROMPT_TEMPLATE_CACHE: "OrderedDict[str, Tuple[float, ChatPromptTemplate]]" = (
+    OrderedDict()
+)
+_PROMPT_TEMPLATE_CACHE_SIZE = 256
+_PROMPT_TEMPLATE_TTL_SECONDS = 300.0
+
+# Streamed chunks are handed to the history buffer in batches of this size.
+_HISTORY_FLUSH_CHUNKS = 32
+_HISTORY_FLUSH_CHARS = 512
+
+# Only the start of a response is kept for the debug log.
+_LOG_RESPONSE_CHARS = 512
+
+_EMPTY_CITATIONS_PREFIX = b'{"citations":[],"message":'
+
+
+class BaseStreamingChatAgent(ABC):
+    """Shared LLM, chain and streaming plumbing for single-chain chat agents.
+
+    Subclasses set ``agent_id`` and implement ``_get_prompt_texts`` and
+    ``_build_tool_results``; ``run`` streams the chain output as encoded JSON
+    chunks and persists the response through the chat history buffer.
+    """
+
+    agent_id: str
+
+    def __init__(self, db: Session, llm_provider):
+        self.db = db
+        self._llm = None
+        self._llm_provider = llm_provider
+        self.history_manager = ChatHistoryService(db)
+        self.prompt_service = PromptService(db)
+        self.chain = None
+        self.llm_rate_limiter: Optional[RateLimiter] = None
+
+    def _handle_llm_error(self, e: Exception):
+        if self.llm_rate_limiter and (
+            "429" in str(e) or "quota exceeded" in str(e).lower()
+        ):
+            self.llm_rate_limiter.handle_quota_exceeded()
+            logger.error("LLM API quota exceeded")
+
+    async def _get_llm(self):
+        """Helper method to get or initialize LLM with caching"""
+        if self._llm is not None:
+            return self._llm
+
+        # Errors propagate to run(), which records quota failures once.
+        self._llm = await self._llm_provider.get_small_llm(
+            agent_type=AgentType.LANGCHAIN
+        )
+        return self._llm
+
+    @abstractmethod
+    async def _get_prompt_texts(self) -> Tuple[str, Optional[str]]:
+        """Return the system prompt and, if the agent uses one, the human prompt."""
+
+    @abstractmethod
+    async def _build_tool_results(
+        self,
+        query: str,
+        project_id: str,
+        user_id: str,
+        conversation_id: str,
+        node_ids: List[NodeContext],
+        history: List[BaseMessage],
+    ) -> Tuple[List[BaseMessage], Optional[List[str]]]:
+        """Return the tool result messages and the citations to stream, if any."""
+
+    async def _get_prompt_template(self) -> ChatPromptTemplate:
+        cached = _PROMPT_TEMPLATE_CACHE.get(self.agent_id)
+        if cached is not None:
+            expires_at, prompt_template = cached
+            if time.monotonic() < expires_at:
+                _PROMPT_TEMPLATE_CACHE.move_to_end(self.agent_id)
+                return prompt_template
+            del _PROMPT_TEMPLATE_CACHE[self.agent_id]
+
+        # Built without a lock: a concurrent miss just builds an identical
+        # template, which is cheaper than serializing every prompt fetch.
+        system_prompt, human_prompt = await self._get_prompt_texts()
+        messages = [
+            SystemMessagePromptTemplate.from_template(system_prompt),
+            MessagesPlaceholder(variable_name="history"),
+            MessagesPlaceholder(variable_name="tool_results"),
+        ]
+        if human_prompt is not None:
+            messages.append(HumanMessagePromptTemplate.from_template(human_prompt))
+
+        prompt_template = ChatPromptTemplate(messages=messages)
+        _PROMPT_TEMPLATE_CACHE[self.agent_id] = (
+            time.monotonic() + _PROMPT_TEMPLATE_TTL_SECONDS,
+            prompt_template,
+        )
+        _PROMPT_TEMPLATE_CACHE.move_to_end(self.agent_id)
+        if len(_PROMPT_TEMPLATE_CACHE) > _PROMPT_TEMPLATE_CACHE_SIZE:
+            _PROMPT_TEMPLATE_CACHE.popitem(last=False)
+        return prompt_template
+
+    async def _create_chain(self) -> RunnableSequence:
+        prompt_template = await self._get_prompt_template()
+        llm = await self._get_llm()
+        return prompt_template | llm
+
+    async def _stream_with_persistence(
+        self,
+        inputs: Dict,
+        conversation_id: str,
+        citations: Optional[List[str]] = None,
+    ) -> AsyncGenerator[bytes, None]:
+        # Citations are fixed for the whole stream, so encode them once and
+        # only serialize the message content per chunk.
+        if citations:
+            response_prefix = (
+                b'{"citations":' + orjson.dumps(citations) + b',"message":'
+            )
+        else:
+            response_prefix = _EMPTY_CITATIONS_PREFIX
+
+        response_head = ""
+        pending: List[str] = []
+        pending_len = 0
+        if self.llm_rate_limiter:
+            # Count the outbound LLM request itself, not client lookups. Taken
+            # before a stream slot so rate-limited waits do not hold one.
+            await self.llm_rate_limiter.acquire()
+            logger.debug("Rate limiter acquired for LLM call")
+        async with ProviderService.stream_slot():
+            async for chunk in self.chain.astream(inputs):
+                content = chunk.content if hasattr(chunk, "content") else str(chunk)
+                pending.append(content)
+                pending_len += len(content)
+                if (
+                    len(pending) >= _HISTORY_FLUSH_CHUNKS
+                    or pending_len >= _HISTORY_FLUSH_CHARS
+                ):
+                    batch = "".join(pending)
+                    if len(response_head) < _LOG_RESPONSE_CHARS:
+                        response_head += batch[
+                            : _LOG_RESPONSE_CHARS - len(response_head)
+                        ]
+                    self.history_manager.add_message_chunk(
+                        conversation_id,
+                        batch,
+                        MessageType.AI_GENERATED,
+                        citations=citations,
+                    )
+                    pending = []
+                    pending_len = 0
+                yield response_prefix + orjson.dumps(content) + b"}"
+
+        if pending:
+            batch = "".join(pending)
+            if len(response_head) < _LOG_RESPONSE_CHARS:
+                response_head += batch[: _LOG_RESPONSE_CHARS - len(response_head)]
+            self.history_manager.add_message_chunk(
+                conversation_id,
+                batch,
+                MessageType.AI_GENERATED,
+                citations=citations,
+            )
+
+        logger.debug(
+            "LLM response (first %d chars): %s", _LOG_RESPONSE_CHARS, response_head
+        )
+        self.history_manager.flush_message_buffer(
+            conversation_id, MessageType.AI_GENERATED
+        )
+
+    async def run(
+        self,
+        query: str,
+        project_id: str,
+        user_id: str,
+        conversation_id: str,
+        node_ids: List[NodeContext],
+    ) -> AsyncGenerator[bytes, None]:
+        try:
+            if not self.chain:
+                self.chain = await self._create_chain()
+
+            history = self.history_manager.get_session_history(user_id, conversation_id)
+            tool_results, citations = await self._build_tool_results(
+                query, project_id, user_id, conversation_id, node_ids, history
+            )
+
+            inputs = {
+                "history": history,
+                "tool_results": tool_results,
+                "input": query,
+            }
+
+            logger.debug(
+                "Inputs to LLM: history=%d tool_results=%d input_len=%d",
+                len(history),
+                len(tool_results),
+                len(query),
+            )
+
+            async for chunk in self._stream_with_persistence(
+                inputs, conversation_id, citations
+            ):
+                yield chunk
+
+        except Exception as e:
+            self._handle_llm_error(e)
+            logger.error(
+                f"Error during {type(self).__name__} run: {str(e)}", exc_info=True
+            )
+            yield f"An error occurred: {str(e)}".encode()
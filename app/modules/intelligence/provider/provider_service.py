@@ -2,8 +2,9 @@ import logging
 import os
 import asyncio
 from enum import Enum
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
+import httpx
 from crewai import LLM
 from langchain_anthropic import ChatAnthropic
 from langchain_openai.chat_models import ChatOpenAI
@@ -24,6 +25,15 @@ class AgentType(Enum):
     LANGCHAIN = "LANGCHAIN"
 
 class ProviderService:
+    # One pooled client for every LangChain LLM so that keep-alive connections
+    # (and their TLS sessions) are reused across agents and requests. It is
+    # bound to the API server's event loop, so it is only opened from the
+    # FastAPI startup hook; elsewhere (e.g. Celery tasks, which run each task
+    # in a fresh asyncio.run) it stays None and the SDK builds its own client.
+    _shared_httpx: Optional[httpx.AsyncClient] = None
+    # Caps in-flight LLM streams independently of the requests/minute limiter.
+    _concurrency = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "32")))
+
     def __init__(self, db, user_id: str):
         """Initialize ProviderService with database session and user ID."""
         logger.info(f"Initializing ProviderService for user_id: {user_id}")
@@ -40,6 +50,57 @@ class ProviderService:
         self.llm_rate_limiter = RateLimiter(name="LLM_API")
         logger.debug("Rate limiter initialized for provider service")
 
+    @classmethod
+    def open_shared_client(cls):
+        """Create the pooled HTTP client shared by all LLM instances."""
+        if cls._shared_httpx is None:
+            logger.info("Opening shared LLM HTTP client")
+            cls._shared_httpx = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=2000,
+                    max_keepalive_connections=1500,
+                    # httpx drops idle connections after 5s by default, which
+                    # would discard pre-warmed connections before first use.
+                    keepalive_expiry=300.0,
+                ),
+                timeout=httpx.Timeout(120.0),
+            )
+
+    @classmethod
+    async def prewarm(cls, n: int = 4):
+        """Open n keep-alive connections to the LLM endpoint ahead of the first request."""
+        if cls._shared_httpx is None:
+            return
+
+        if os.getenv("isDevelopmentMode") == "enabled":
+            url = "https://api.openai.com/v1/models"
+        else:
+            url = PORTKEY_GATEWAY_URL
+        logger.info(f"Pre-warming {n} LLM connections to {url}")
+
+        async def _head():
+            try:
+                # Any status (404/405 included) means the connection is pooled.
+                # Short timeout so an unreachable gateway cannot stall startup.
+                await cls._shared_httpx.head(url, timeout=5.0)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to pre-warm LLM connection: {str(e)}")
+
+        await asyncio.gather(*(_head() for _ in range(n)))
+
+    @classmethod
+    async def close_shared_client(cls):
+        """Close the pooled HTTP client shared by all LLM instances."""
+        if cls._shared_httpx is not None:
+            logger.info("Closing shared LLM HTTP client")
+            await cls._shared_httpx.aclose()
+            cls._shared_httpx = None
+
+    @classmethod
+    def stream_slot(cls) -> asyncio.Semaphore:
+        """Return the process-wide limiter to hold for the length of an LLM stream."""
+        return cls._concurrency
+
     @classmethod
     def create(cls, db, user_id: str):
         """Factory method to create ProviderService instance."""
@@ -203,6 +264,7 @@ class ProviderService:
                             model_name="gpt-4",
                             api_key=openai_key,
                             temperature=0.3,
+                            http_async_client=self._shared_httpx,
                         )
                 else:
                     logger.debug("Production mode, fetching API key from secret manager")
@@ -241,6 +303,7 @@ class ProviderService:
                             model_name="gpt-4",
                             api_key=openai_key,
                             temperature=0.3,
+                            http_async_client=self._shared_httpx,
                             base_url=PORTKEY_GATEWAY_URL,
                             default_headers=portkey_headers,
                         )
@@ -448,6 +511,7 @@ class ProviderService:
                             model_name="gpt-4o-mini",
                             api_key=openai_key,
                             temperature=0.3,
+                            http_async_client=self._shared_httpx,
                         )
                 else:
                     logger.debug("Production mode, fetching API key from secret manager")
@@ -486,6 +550,7 @@ class ProviderService:
                             model_name="gpt-4o-mini",
                             api_key=openai_key,
                             temperature=0.3,
+                            http_async_client=self._shared_httpx,
                             base_url=PORTKEY_GATEWAY_URL,
                             default_headers=portkey_headers,
                         )
@@ -1,8 +1,8 @@
 import os
 import asyncio
 import random
-from datetime import datetime, timedelta
-from collections import deque
+import time
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,122 +12,94 @@ class RateLimiter:
         self.name = name
         # Get configurable limits from environment variables with defaults
         self.MAX_REQUESTS_PER_MINUTE = int(os.getenv(f"{name.upper()}_MAX_REQUESTS_PER_MINUTE", 50))
-        self.MAX_CONCURRENT_REQUESTS = int(os.getenv(f"{name.upper()}_MAX_CONCURRENT_REQUESTS", 5))
         self.QUOTA_BACKOFF_SECONDS = int(os.getenv(f"{name.upper()}_QUOTA_BACKOFF_SECONDS", 60))
         self.MAX_QUEUE_SIZE = int(os.getenv(f"{name.upper()}_MAX_QUEUE_SIZE", 1000))
         self.MAX_FAILURES = int(os.getenv(f"{name.upper()}_MAX_FAILURES", 5))
         self.CIRCUIT_RESET_TIME = int(os.getenv(f"{name.upper()}_CIRCUIT_RESET_TIME", 300))
         
-        self._request_timestamps = deque()
-        self._request_queue = asyncio.Queue(maxsize=self.MAX_QUEUE_SIZE)
-        self._request_semaphore = asyncio.Semaphore(
-            self.MAX_CONCURRENT_REQUESTS if self.MAX_CONCURRENT_REQUESTS > 0 else 1000000
-        )
-        self._rate_limit_lock = asyncio.Lock()
+        # Token bucket: refills at MAX_REQUESTS_PER_MINUTE / 60 tokens per second
+        # and holds at most MAX_REQUESTS_PER_MINUTE tokens.
+        self._capacity = float(self.MAX_REQUESTS_PER_MINUTE)
+        self._refill_rate = self.MAX_REQUESTS_PER_MINUTE / 60.0
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._cond = asyncio.Condition()
+        self._waiters = 0
         self.total_requests = 0
         self.rate_limited_requests = 0
-        self._worker_task = None
-        self._processing = True
         self._last_quota_exceeded = None
         self._consecutive_failures = 0
         self._circuit_open = False
-        self._processing_lock = asyncio.Lock()
 
         logger.info(
             f"Initialized rate limiter '{name}' with {self.MAX_REQUESTS_PER_MINUTE} "
-            f"requests/minute, {self.MAX_CONCURRENT_REQUESTS} concurrent requests, "
-            f"and {self.QUOTA_BACKOFF_SECONDS}s quota backoff"
+            f"requests/minute and {self.QUOTA_BACKOFF_SECONDS}s quota backoff"
         )
 
-    async def _worker(self):
-        while self._processing:
-            try:
-                future = await self._request_queue.get()
-                try:
-                    async with self._request_semaphore:
-                        result = await self._process_request()
-                        future.set_result(result)
-                except Exception as e:
-                    future.set_exception(e)
-                finally:
-                    self._request_queue.task_done()
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error in worker: {e}")
-                continue
-
-    async def acquire(self):
-        """Queue request and wait for processing"""
-        async with self._processing_lock:  # Ensure sequential processing
-            if self._worker_task is None or self._worker_task.done():
-                self._processing = True
-                self._worker_task = asyncio.create_task(self._worker())
-
-            future = asyncio.Future()
-            await self._request_queue.put(future)
-            
-            try:
-                return await asyncio.wait_for(future, timeout=30)
-            except asyncio.TimeoutError:
-                logger.error(f"Timeout waiting for rate limiter {self.name}")
-                raise Exception("Service is currently overloaded. Please try again later.")
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last refill, up to capacity"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._refill_rate)
 
-    async def _process_request(self):
-        """Process a single request with rate limiting"""
+    async def acquire(self, timeout: float = 30):
+        """Wait for a token, sleeping exactly until the next one is due"""
         if self._circuit_open:
             if (datetime.now() - self._last_quota_exceeded).total_seconds() < self.CIRCUIT_RESET_TIME:
                 raise Exception(f"Circuit breaker open for {self.name}")
             self._circuit_open = False
             self._consecutive_failures = 0
 
-        async with self._rate_limit_lock:
-            now = datetime.now()
-            # Remove timestamps older than 1 minute
-            while self._request_timestamps and self._request_timestamps[0] < now - timedelta(minutes=1):
-                self._request_timestamps.popleft()
-
-            if len(self._request_timestamps) >= self.MAX_REQUESTS_PER_MINUTE:
-                wait_time = (self._request_timestamps[0] + timedelta(minutes=1) - now).total_seconds()
-                if wait_time > 0:
-                    logger.warning(f"Rate limit reached. Waiting {wait_time:.2f}s")
-                    await asyncio.sleep(wait_time)
-
-            self._request_timestamps.append(now)
+        if self.MAX_REQUESTS_PER_MINUTE <= 0:
             self.total_requests += 1
             return True
 
-    async def _check_rate_limit(self):
-        """Check and enforce rate limits with improved tracking"""
-        if self.MAX_REQUESTS_PER_MINUTE == 0:
-            return
-
-        async with self._rate_limit_lock:
-            now = datetime.now()
-            # Remove timestamps older than 1 minute
-            while self._request_timestamps and self._request_timestamps[0] < now - timedelta(minutes=1):
-                self._request_timestamps.popleft()
-
-            # Calculate current rate and capacity
-            current_rate = len(self._request_timestamps)
-            capacity_used = current_rate / self.MAX_REQUESTS_PER_MINUTE
-
-            if current_rate >= self.MAX_REQUESTS_PER_MINUTE:
-                self.rate_limited_requests += 1
-                wait_time = (self._request_timestamps[0] + timedelta(minutes=1) - now).total_seconds()
-                if wait_time > 0:
-                    logger.warning(
-                        f"Rate limit reached for {self.name}. "
-                        f"Waiting {wait_time:.2f}s. "
-                        f"Capacity: {capacity_used*100:.1f}%, "
-                        f"Total: {self.total_requests}, "
-                        f"Limited: {self.rate_limited_requests}"
-                    )
-                    await asyncio.sleep(wait_time)
-
-            # Add current timestamp
-            self._request_timestamps.append(now)
-            self.total_requests += 1
+        if self._waiters >= self.MAX_QUEUE_SIZE:
+            logger.error(f"Too many requests waiting for rate limiter {self.name}")
+            raise Exception("Service is currently overloaded. Please try again later.")
+
+        # shutdown() may swap in a new Condition while this call waits, so keep
+        # using the one whose lock was taken.
+        cond = self._cond
+        deadline = time.monotonic() + timeout
+        self._waiters += 1
+        try:
+            async with cond:
+                limited = False
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.total_requests += 1
+                        if self._tokens >= 1:
+                            # Let the next waiter take the remaining burst capacity.
+                            cond.notify(1)
+                        return True
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        logger.error(f"Timeout waiting for rate limiter {self.name}")
+                        raise Exception(
+                            "Service is currently overloaded. Please try again later."
+                        )
+
+                    wait_for = (1 - self._tokens) / self._refill_rate
+                    if not limited:
+                        limited = True
+                        self.rate_limited_requests += 1
+                        logger.warning(
+                            f"Rate limit reached for {self.name}. "
+                            f"Waiting {wait_for:.2f}s for the next token"
+                        )
+                    try:
+                        await asyncio.wait_for(
+                            cond.wait(), timeout=min(wait_for, remaining)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._waiters -= 1
 
     def handle_quota_exceeded(self):
         """Handle quota exceeded with exponential backoff"""
@@ -153,14 +125,15 @@ class RateLimiter:
         return effective_backoff
 
     async def shutdown(self):
-        """Gracefully shutdown the worker"""
-        self._processing = False
-        if self._worker_task:
-            self._worker_task.cancel()
-            try:
-                await self._worker_task
-            except asyncio.CancelledError:
-                pass
+        """Wake pending waiters and reset loop-bound state.
+
+        This does not stop the limiter; later acquire() calls still work. It
+        lets a module-level limiter be reused from the next event loop, as the
+        Celery parsing task does with one asyncio.run per task.
+        """
+        async with self._cond:
+            self._cond.notify_all()
+        self._cond = asyncio.Condition()
 
     def get_metrics(self):
         """Return current metrics"""
@@ -168,10 +141,9 @@ class RateLimiter:
             "name": self.name,
             "total_requests": self.total_requests,
             "rate_limited_requests": self.rate_limited_requests,
-            "current_window_requests": len(self._request_timestamps),
+            "available_tokens": self._tokens,
             "max_requests_per_minute": self.MAX_REQUESTS_PER_MINUTE,
-            "max_concurrent_requests": self.MAX_CONCURRENT_REQUESTS,
-            "queue_size": self._request_queue.qsize(),
+            "queue_size": self._waiters,
             "in_backoff": bool(self._last_quota_exceeded),
             "circuit_open": self._circuit_open,
             "consecutive_failures": self._consecutive_failures